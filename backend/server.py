@@ -2,18 +2,25 @@ from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, Response
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReplaceOne, ReturnDocument, UpdateMany, UpdateOne
+from pymongo.write_concern import WriteConcern
+from pymongo.errors import BulkWriteError, ConnectionFailure, DuplicateKeyError
 import os
 import logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, WatchedFileHandler
+import queue
 import secrets
 from pathlib import Path
-from pydantic import BaseModel, Field, EmailStr, validator
-from typing import List, Optional, Dict, Any
-import uuid
+from pydantic import BaseModel, Field, EmailStr, field_validator
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime, timezone, timedelta
 import bcrypt
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
 import jwt
 import re
 from slowapi import Limiter, _rate_limit_exceeded_handler
@@ -22,28 +29,95 @@ from slowapi.errors import RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
 import hashlib
 import hmac
+import asyncio
+import time
+import orjson
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
+logger = logging.getLogger(__name__)
 
 # Security Configuration
-ALLOWED_HOSTS = os.environ.get('ALLOWED_HOSTS', 'localhost,127.0.0.1,crust-corner.preview.emergentagent.com').split(',')
+ALLOWED_HOSTS = tuple(
+    host.strip()
+    for host in os.environ.get('ALLOWED_HOSTS', 'localhost,127.0.0.1,crust-corner.preview.emergentagent.com').split(',')
+    if host.strip()
+)
+CORS_ORIGINS = tuple(
+    origin.strip()
+    for origin in os.environ.get('CORS_ORIGINS', 'https://crust-corner.preview.emergentagent.com,http://localhost:3000').split(',')
+    if origin.strip()
+)
+CORS_ORIGIN_REGEX = os.environ.get('CORS_ORIGIN_REGEX')  # single compiled pattern instead of listing every origin
+# Auth is a bearer header, not cookies; a '*' origin only works without credentials (no per-request origin echo)
+CORS_ALLOW_CREDENTIALS = '*' not in CORS_ORIGINS
 JWT_SECRET = os.environ.get('JWT_SECRET')
 if not JWT_SECRET or len(JWT_SECRET) < 32:
     JWT_SECRET = secrets.token_urlsafe(32)
-    logging.warning("Generated new JWT secret. Set JWT_SECRET in environment for production.")
+    logger.warning("Generated new JWT secret. Set JWT_SECRET in environment for production.")
 
 JWT_ALGORITHM = 'HS256'
+JWT_SIGNING_KEY = JWT_SECRET.encode('utf-8')
+JWT_DECODE_ALGORITHMS = [JWT_ALGORITHM]
+JWT_DECODE_OPTIONS = {'require': ['exp', 'user_id']}
 JWT_EXPIRATION_HOURS = 24
 MAX_LOGIN_ATTEMPTS = 5
 LOGIN_LOCKOUT_MINUTES = 15
+# Joined customer is rebuilt from an allow-list of contact fields, so new (possibly secret) user fields never leak
+ADMIN_ORDER_CUSTOMER = {'id': '$user.id', 'email': '$user.email', 'full_name': '$user.full_name', 'phone': '$user.phone'}
+# A customer's own orders don't need to echo back their user_id
+USER_ORDER_PROJECTION = {'_id': 0, 'user_id': 0}
+# Handlers only read id, email and is_admin; locked_until is needed for the lockout check
+AUTH_USER_PROJECTION = {'_id': 0, 'id': 1, 'email': 1, 'is_admin': 1, 'locked_until': 1}
+VALID_ORDER_STATUSES = frozenset({"pending", "confirmed", "preparing", "ready", "delivered", "cancelled"})
+ID_DELETE_CHARS = str.maketrans('', '', '0123456789abcdef-')
+UNSAFE_CHARS_TABLE = str.maketrans('', '', '<>&"\'')
+UPPERCASE_PATTERN = re.compile(r'[A-Z]')
+LOWERCASE_PATTERN = re.compile(r'[a-z]')
+DIGIT_PATTERN = re.compile(r'\d')
+TOKEN_CACHE_TTL_SECONDS = int(os.environ.get('TOKEN_CACHE_TTL_SECONDS', '30'))
+TOKEN_CACHE_MAX_ENTRIES = 10000
+CATALOG_CACHE_TTL_SECONDS = int(os.environ.get('CATALOG_CACHE_TTL_SECONDS', '30'))
+CATALOG_CACHE_MAX_ENTRIES = 256
+GZIP_MINIMUM_SIZE = 1500  # bodies that already fit in one packet aren't worth a DEFLATE pass
+GZIP_COMPRESS_LEVEL = int(os.environ.get('GZIP_COMPRESS_LEVEL', '1'))  # Starlette defaults to 9; 1 keeps most of the JSON savings
+ARGON2_TIME_COST = int(os.environ.get('ARGON2_TIME_COST', '3'))
+ARGON2_MEMORY_COST = int(os.environ.get('ARGON2_MEMORY_COST', '65536'))  # KiB
+ARGON2_PARALLELISM = int(os.environ.get('ARGON2_PARALLELISM', '4'))
+PASSWORD_HASH_BUDGET_MS = float(os.environ.get('PASSWORD_HASH_BUDGET_MS', '0'))
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', str(os.cpu_count() or 4)))
+# Startup retries while Mongo is unreachable before giving up (backoff 2s, 4s, ... capped at 30s)
+DB_PREPARE_ATTEMPTS = int(os.environ.get('DB_PREPARE_ATTEMPTS', '5'))
+SEED_SAMPLE_DATA = os.environ.get('SEED_SAMPLE_DATA', 'true').lower() == 'true'
+SEED_SENTINEL_ID = 'sample_data_seed'
+# Older releases stored these dates as ISO strings; startup converts them to BSON dates once
+LEGACY_DATE_FIELDS = (
+    ('users', ('created_at', 'last_login', 'locked_until')),
+    ('categories', ('created_at',)),
+    ('products', ('created_at',)),
+    ('orders', ('created_at', 'updated_at')),
+)
+DATES_MIGRATED_ID = 'legacy_dates_migrated'
+CATALOG_DEDUPED_ID = 'catalog_names_deduped'
+SEED_WRITE_CONCERN = WriteConcern(w=1, j=False)  # sample menu is re-seedable; skip replica acks and journal waits
 
-# Rate limiting
-limiter = Limiter(key_func=get_remote_address)
+# Rate limiting: counters are per-process in memory unless RATE_LIMIT_STORAGE_URI points at shared storage
+# (e.g. redis://host:6379, which needs the redis package) so limits hold across workers
+limiter = Limiter(key_func=get_remote_address, storage_uri=os.environ.get('RATE_LIMIT_STORAGE_URI', 'memory://'))
 
 # MongoDB connection with security
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url, serverSelectionTimeoutMS=5000)
+client = AsyncIOMotorClient(
+    mongo_url,
+    maxPoolSize=int(os.environ.get('MONGO_MAX_POOL_SIZE', '200')),
+    minPoolSize=int(os.environ.get('MONGO_MIN_POOL_SIZE', '20')),
+    maxIdleTimeMS=300000,
+    serverSelectionTimeoutMS=3000,
+    tz_aware=True,
+    compressors=os.environ.get('MONGO_COMPRESSORS', 'zstd,zlib')  # first one the server also supports wins; zstd needs zstandard
+)
 db = client[os.environ['DB_NAME']]
 
 # Create the main app
@@ -51,13 +125,14 @@ app = FastAPI(
     title="I Love NY Pizza API",
     description="Secure Pizza Ordering System",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
     docs_url=None,  # Disable docs in production
     redoc_url=None  # Disable redoc in production
 )
 
 # Security Middleware
 app.add_middleware(TrustedHostMiddleware, allowed_hosts=ALLOWED_HOSTS)
-app.add_middleware(GZipMiddleware, minimum_size=1000)
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE, compresslevel=GZIP_COMPRESS_LEVEL)
 app.add_middleware(SlowAPIMiddleware)
 
 # Rate limiting exception handler
@@ -67,11 +142,10 @@ app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
-# Security headers middleware
-@app.middleware("http")
-async def add_security_headers(request: Request, call_next):
-    response = await call_next(request)
-    response.headers.update({
+# Security headers middleware: pre-encoded once, appended as raw ASGI headers (no BaseHTTPMiddleware task per request)
+SECURITY_HEADERS = [
+    (name.lower().encode('latin-1'), value.encode('latin-1'))
+    for name, value in {
         "X-Content-Type-Options": "nosniff",
         "X-Frame-Options": "DENY",
         "X-XSS-Protection": "1; mode=block",
@@ -79,89 +153,184 @@ async def add_security_headers(request: Request, call_next):
         "Content-Security-Policy": "default-src 'self'; script-src 'self' 'unsafe-inline'; style-src 'self' 'unsafe-inline'; img-src 'self' data: https:; font-src 'self' https:; connect-src 'self'",
         "Referrer-Policy": "strict-origin-when-cross-origin",
         "Permissions-Policy": "geolocation=(), microphone=(), camera=()"
-    })
-    return response
+    }.items()
+]
+
+class SecurityHeadersMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        async def send_with_headers(message):
+            if message['type'] == 'http.response.start':
+                message['headers'] = [*message.get('headers', ()), *SECURITY_HEADERS]
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+app.add_middleware(SecurityHeadersMiddleware)
 
 # Security utilities
+password_hasher = PasswordHasher(time_cost=ARGON2_TIME_COST, memory_cost=ARGON2_MEMORY_COST, parallelism=ARGON2_PARALLELISM)
+# Dedicated pool: hashing is CPU/memory bound, so cap it near the core count and keep it off the shared default executor
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix='password-hash')
+
+def is_bcrypt_hash(hashed: str) -> bool:
+    """Detect legacy bcrypt hashes stored before the move to Argon2id"""
+    return hashed.startswith(('$2a$', '$2b$', '$2y$'))
+
 def hash_password(password: str) -> str:
-    """Securely hash password with salt"""
-    salt = bcrypt.gensalt(rounds=12)
-    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+    """Securely hash password with Argon2id"""
+    return password_hasher.hash(password)
 
 def verify_password(password: str, hashed: str) -> bool:
-    """Verify password against hash"""
+    """Verify password against an Argon2id or legacy bcrypt hash"""
     try:
-        return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
-    except Exception:
+        if is_bcrypt_hash(hashed):
+            return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+        return password_hasher.verify(hashed, password)
+    except (VerificationError, InvalidHashError, ValueError):
+        # Mismatch, or a malformed/unknown stored hash
         return False
 
+def password_needs_rehash(hashed: str) -> bool:
+    """Check whether a hash is bcrypt or uses outdated Argon2 parameters"""
+    try:
+        return is_bcrypt_hash(hashed) or password_hasher.check_needs_rehash(hashed)
+    except InvalidHashError:
+        return True
+
+async def hash_password_async(password: str) -> str:
+    """Hash password in the password pool so hashing doesn't block the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, hash_password, password)
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    """Verify password in the password pool so hashing doesn't block the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, verify_password, password, hashed)
+
+def tune_argon2_time_cost(budget_ms: float, min_cost: int = 2, max_cost: int = 6) -> int:
+    """Pick the highest Argon2 time cost whose hash time fits the latency budget"""
+    chosen_cost = min_cost
+    for cost in range(min_cost, max_cost + 1):
+        hasher = PasswordHasher(time_cost=cost, memory_cost=ARGON2_MEMORY_COST, parallelism=ARGON2_PARALLELISM)
+        start = time.perf_counter()
+        hasher.hash('cost-benchmark')
+        if (time.perf_counter() - start) * 1000 > budget_ms:
+            break
+        chosen_cost = cost
+    return chosen_cost
+
 def create_access_token(data: dict) -> str:
     """Create JWT token with expiration"""
     to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(hours=JWT_EXPIRATION_HOURS)
-    to_encode.update({"exp": expire, "iat": datetime.utcnow()})
-    return jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    issued_at = int(time.time())  # JWT claims are epoch seconds; skip building datetimes
+    to_encode.update({"exp": issued_at + JWT_EXPIRATION_HOURS * 3600, "iat": issued_at})
+    return jwt.encode(to_encode, JWT_SIGNING_KEY, algorithm=JWT_ALGORITHM)
 
 def verify_token(token: str) -> dict:
     """Verify and decode JWT token"""
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        payload = jwt.decode(token, JWT_SIGNING_KEY, algorithms=JWT_DECODE_ALGORITHMS, options=JWT_DECODE_OPTIONS)
         return payload
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
-    except jwt.JWTError:
+    except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
 def sanitize_input(input_str: str) -> str:
     """Sanitize user input to prevent injection attacks"""
     if not isinstance(input_str, str):
         return str(input_str)
-    # Remove potentially dangerous characters
-    sanitized = re.sub(r'[<>&"\']', '', input_str)
-    return sanitized.strip()
+    # Remove potentially dangerous characters; memchr-backed `in` checks skip the rewrite for clean input
+    if '<' in input_str or '>' in input_str or '&' in input_str or '"' in input_str or "'" in input_str:
+        input_str = input_str.translate(UNSAFE_CHARS_TABLE)
+    return input_str.strip()
 
 def validate_password_strength(password: str) -> bool:
     """Validate password meets security requirements"""
     if len(password) < 8:
         return False
-    if not re.search(r'[A-Z]', password):
+    if not UPPERCASE_PATTERN.search(password):
         return False
-    if not re.search(r'[a-z]', password):
+    if not LOWERCASE_PATTERN.search(password):
         return False
-    if not re.search(r'\d', password):
+    if not DIGIT_PATTERN.search(password):
         return False
     return True
 
 # Helper functions
-def prepare_for_mongo(data):
-    if isinstance(data.get('created_at'), datetime):
-        data['created_at'] = data['created_at'].isoformat()
-    if isinstance(data.get('updated_at'), datetime):
-        data['updated_at'] = data['updated_at'].isoformat()
-    return data
-
-def parse_from_mongo(item):
-    if isinstance(item.get('created_at'), str):
-        item['created_at'] = datetime.fromisoformat(item['created_at'])
-    if isinstance(item.get('updated_at'), str):
-        item['updated_at'] = datetime.fromisoformat(item['updated_at'])
-    return item
+def is_valid_id(value: str) -> bool:
+    """Check a path id is 32-36 lowercase hex/dash chars; one C-level translate instead of a regex"""
+    return 32 <= len(value) <= 36 and not value.translate(ID_DELETE_CHARS)
+
+def generate_id() -> str:
+    """Random 128-bit hex id; cheaper than formatting a uuid4 string"""
+    return secrets.token_hex(16)
+
+async def insert_document(collection, document: dict) -> dict:
+    """Insert a document, dropping the _id the driver adds in place so it can be returned as-is"""
+    await collection.insert_one(document)
+    document.pop('_id', None)
+    return document
+
+# Pre-encoded catalog list bodies: (endpoint, filters...) -> (cache expiry epoch, JSON bytes, ETag)
+_catalog_cache: Dict[tuple, Tuple[float, bytes, str]] = {}
+
+def get_cached_catalog(key: tuple) -> Optional[Tuple[bytes, str]]:
+    cached = _catalog_cache.get(key)
+    if cached and cached[0] > time.time():
+        return cached[1], cached[2]
+    return None
+
+def cache_catalog(key: tuple, body: bytes) -> Tuple[bytes, str]:
+    if len(_catalog_cache) >= CATALOG_CACHE_MAX_ENTRIES:
+        _catalog_cache.clear()
+    # Weak validator: GZipMiddleware may re-encode the body, but the JSON content is what it identifies
+    etag = f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    _catalog_cache[key] = (time.time() + CATALOG_CACHE_TTL_SECONDS, body, etag)
+    return body, etag
+
+def catalog_response(request: Request, body: bytes, etag: str) -> Response:
+    """Serve a cached catalog body, or a bodiless 304 when the client already holds this version"""
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match and etag in (tag.strip() for tag in if_none_match.split(',')):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type='application/json', headers=headers)
+
+def invalidate_catalog_cache():
+    """Drop cached category/product lists after any catalog write"""
+    _catalog_cache.clear()
+
+def is_account_locked(locked_until) -> bool:
+    """Check a lockout timestamp; accepts legacy ISO-string values too"""
+    if not locked_until:
+        return False
+    if isinstance(locked_until, str):
+        locked_until = datetime.fromisoformat(locked_until)
+    return locked_until > datetime.now(timezone.utc)
 
 # Security models
 class UserBase(BaseModel):
     email: EmailStr
     full_name: str = Field(..., min_length=2, max_length=100)
-    phone: Optional[str] = Field(None, regex=r'^\+?1?\d{9,15}$')
+    phone: Optional[str] = Field(None, pattern=r'^\+?1?\d{9,15}$')
     address: Optional[str] = Field(None, max_length=500)
 
-    @validator('full_name', 'address')
+    @field_validator('full_name', 'address')
+    @classmethod
     def sanitize_text_fields(cls, v):
         if v:
             return sanitize_input(v)
         return v
 
 class User(UserBase):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=generate_id)
     is_admin: bool = False
     failed_login_attempts: int = 0
     locked_until: Optional[datetime] = None
@@ -171,7 +340,8 @@ class User(UserBase):
 class UserCreate(UserBase):
     password: str = Field(..., min_length=8, max_length=128)
 
-    @validator('password')
+    @field_validator('password')
+    @classmethod
     def validate_password(cls, v):
         if not validate_password_strength(v):
             raise ValueError('Password must be at least 8 characters with uppercase, lowercase, and number')
@@ -182,7 +352,7 @@ class UserLogin(BaseModel):
     password: str = Field(..., max_length=128)
 
 class Category(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=generate_id)
     name: str = Field(..., min_length=1, max_length=100)
     description: Optional[str] = Field(None, max_length=500)
     image_url: Optional[str] = Field(None, max_length=1000)
@@ -190,7 +360,8 @@ class Category(BaseModel):
     sort_order: int = 0
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
-    @validator('name', 'description')
+    @field_validator('name', 'description')
+    @classmethod
     def sanitize_text_fields(cls, v):
         if v:
             return sanitize_input(v)
@@ -202,14 +373,15 @@ class CategoryCreate(BaseModel):
     image_url: Optional[str] = Field(None, max_length=1000)
     sort_order: int = 0
 
-    @validator('name', 'description')
+    @field_validator('name', 'description')
+    @classmethod
     def sanitize_text_fields(cls, v):
         if v:
             return sanitize_input(v)
         return v
 
 class Product(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=generate_id)
     name: str = Field(..., min_length=1, max_length=200)
     description: Optional[str] = Field(None, max_length=1000)
     category_id: str
@@ -221,13 +393,15 @@ class Product(BaseModel):
     is_featured: bool = False
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
-    @validator('name', 'description')
+    @field_validator('name', 'description')
+    @classmethod
     def sanitize_text_fields(cls, v):
         if v:
             return sanitize_input(v)
         return v
 
-    @validator('ingredients')
+    @field_validator('ingredients')
+    @classmethod
     def sanitize_ingredients(cls, v):
         if v:
             return [sanitize_input(ingredient) for ingredient in v]
@@ -243,7 +417,8 @@ class ProductCreate(BaseModel):
     sizes: Optional[List[Dict[str, Any]]] = []
     is_featured: bool = False
 
-    @validator('name', 'description')
+    @field_validator('name', 'description')
+    @classmethod
     def sanitize_text_fields(cls, v):
         if v:
             return sanitize_input(v)
@@ -256,18 +431,19 @@ class CartItem(BaseModel):
     price: float = Field(..., gt=0)
 
 class Order(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=generate_id)
     user_id: str
     items: List[CartItem]
     total_amount: float = Field(..., gt=0)
     status: str = Field(default="pending")
     delivery_address: Optional[str] = Field(None, max_length=500)
-    phone: str = Field(..., regex=r'^\+?1?\d{9,15}$')
+    phone: str = Field(..., pattern=r'^\+?1?\d{9,15}$')
     notes: Optional[str] = Field(None, max_length=500)
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
-    @validator('delivery_address', 'notes')
+    @field_validator('delivery_address', 'notes')
+    @classmethod
     def sanitize_text_fields(cls, v):
         if v:
             return sanitize_input(v)
@@ -276,10 +452,11 @@ class Order(BaseModel):
 class OrderCreate(BaseModel):
     items: List[CartItem]
     delivery_address: Optional[str] = Field(None, max_length=500)
-    phone: str = Field(..., regex=r'^\+?1?\d{9,15}$')
+    phone: str = Field(..., pattern=r'^\+?1?\d{9,15}$')
     notes: Optional[str] = Field(None, max_length=500)
 
-    @validator('delivery_address', 'notes')
+    @field_validator('delivery_address', 'notes')
+    @classmethod
     def sanitize_text_fields(cls, v):
         if v:
             return sanitize_input(v)
@@ -288,48 +465,81 @@ class OrderCreate(BaseModel):
 # Security: Bearer token authentication
 security = HTTPBearer()
 
+# Validated token cache: 128-bit BLAKE2b digest of token -> (cache expiry epoch, User)
+_token_cache: Dict[bytes, Tuple[float, User]] = {}
+
+def token_cache_key(token: str) -> bytes:
+    """Key the cache by digest so raw bearer tokens are never held in memory"""
+    return hashlib.blake2b(token.encode('utf-8'), digest_size=16).digest()
+
+def cache_validated_token(cache_key: bytes, user: User, token_exp: float):
+    """Cache a successfully validated token until min(token expiry, cache TTL)"""
+    now = time.time()
+    expires_at = min(token_exp, now + TOKEN_CACHE_TTL_SECONDS)
+    if expires_at <= now:
+        return
+    if len(_token_cache) >= TOKEN_CACHE_MAX_ENTRIES:
+        # Nothing is awaited here, so eviction can't interleave with another request on the event loop
+        for key in [k for k, (exp, _) in _token_cache.items() if exp <= now]:
+            _token_cache.pop(key, None)
+        while len(_token_cache) >= TOKEN_CACHE_MAX_ENTRIES:
+            _token_cache.pop(next(iter(_token_cache)), None)
+    _token_cache[cache_key] = (expires_at, user)
+
+def invalidate_user_tokens(user_id: str):
+    """Drop cached tokens for a user so lockouts take effect immediately"""
+    for key in [k for k, (_, u) in _token_cache.items() if u.id == user_id]:
+        _token_cache.pop(key, None)
+
 # Auth helper with enhanced security
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def resolve_user(token: str) -> User:
+    """Resolve a bearer token to its user, verifying it unless cached"""
     try:
-        token = credentials.credentials
+        cache_key = token_cache_key(token)
+        cached = _token_cache.get(cache_key)
+        if cached and cached[0] > time.time():
+            return cached[1]
+
         payload = verify_token(token)
         user_id = payload.get('user_id')
         
         if not user_id:
             raise HTTPException(status_code=401, detail="Invalid token")
         
-        user_data = await db.users.find_one({'id': user_id})
+        user_data = await db.users.find_one({'id': user_id}, AUTH_USER_PROJECTION)
         if not user_data:
             raise HTTPException(status_code=401, detail="User not found")
         
         # Check if account is locked
-        if user_data.get('locked_until'):
-            if datetime.fromisoformat(user_data['locked_until']) > datetime.now(timezone.utc):
-                raise HTTPException(status_code=423, detail="Account temporarily locked")
+        if is_account_locked(user_data.get('locked_until')):
+            raise HTTPException(status_code=423, detail="Account temporarily locked")
         
-        return User(**user_data)
+        user = User.model_construct(**user_data)
+        cache_validated_token(cache_key, user, payload['exp'])
+        return user
     except HTTPException:
         raise
     except Exception as e:
-        logging.error(f"Authentication error: {e}")
+        logger.error("Authentication error: %s", e)
         raise HTTPException(status_code=401, detail="Authentication failed")
 
-async def get_admin_user(current_user: User = Depends(get_current_user)):
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return await resolve_user(credentials.credentials)
+
+async def get_admin_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    # Admin rights come from the stored user record (cached for at most TOKEN_CACHE_TTL_SECONDS), never from
+    # the token, so promotions and demotions apply to existing tokens without a fresh login
+    current_user = await resolve_user(credentials.credentials)
     if not current_user.is_admin:
-        logging.warning(f"Unauthorized admin access attempt by user {current_user.email}")
+        logger.warning("Unauthorized admin access attempt by user %s", current_user.email)
         raise HTTPException(status_code=403, detail="Admin access required")
     return current_user
 
 # Rate limited auth endpoints
-@api_router.post("/auth/register", response_model=Dict[str, Any])
+@api_router.post("/auth/register")
 @limiter.limit("5/minute")
 async def register(request: Request, user_data: UserCreate):
     try:
-        # Check if user exists
-        existing_user = await db.users.find_one({'email': user_data.email.lower()})
-        if existing_user:
-            raise HTTPException(status_code=400, detail="Email already registered")
-        
         # Create user with hashed password
         user = User(
             email=user_data.email.lower(),
@@ -338,191 +548,230 @@ async def register(request: Request, user_data: UserCreate):
             address=user_data.address
         )
         
-        user_dict = prepare_for_mongo(user.dict())
-        user_dict['password'] = hash_password(user_data.password)
+        user_dict = user.model_dump()
+        user_dict['password'] = await hash_password_async(user_data.password)
         
-        await db.users.insert_one(user_dict)
+        # The unique email index rejects duplicates atomically, no pre-check round-trip needed
+        try:
+            await db.users.insert_one(user_dict)
+        except DuplicateKeyError:
+            raise HTTPException(status_code=400, detail="Email already registered")
         
         # Create JWT token
         token = create_access_token({'user_id': user.id})
         
         # Remove sensitive data
-        user_response = user.dict()
+        user_response = user.model_dump()
         user_response.pop('failed_login_attempts', None)
         user_response.pop('locked_until', None)
         
-        logging.info(f"New user registered: {user.email}")
-        return {"token": token, "user": user_response}
+        logger.info("New user registered: %s", user.email)
+        return ORJSONResponse({"token": token, "user": user_response})
         
     except HTTPException:
         raise
     except Exception as e:
-        logging.error(f"Registration error: {e}")
+        logger.error("Registration error: %s", e)
         raise HTTPException(status_code=500, detail="Registration failed")
 
-@api_router.post("/auth/login", response_model=Dict[str, Any])
+@api_router.post("/auth/login")
 @limiter.limit("10/minute")
 async def login(request: Request, login_data: UserLogin):
     try:
-        user_data = await db.users.find_one({'email': login_data.email.lower()})
+        user_data = await db.users.find_one({'email': login_data.email.lower()}, {'_id': 0})
         if not user_data:
             raise HTTPException(status_code=401, detail="Invalid email or password")
         
         # Check if account is locked
-        failed_attempts = user_data.get('failed_login_attempts', 0)
-        locked_until = user_data.get('locked_until')
-        
-        if locked_until and datetime.fromisoformat(locked_until) > datetime.now(timezone.utc):
+        if is_account_locked(user_data.get('locked_until')):
             raise HTTPException(status_code=423, detail="Account temporarily locked due to failed login attempts")
         
         # Verify password
-        if not verify_password(login_data.password, user_data['password']):
-            # Increment failed attempts
-            failed_attempts += 1
-            update_data = {'failed_login_attempts': failed_attempts}
+        if not await verify_password_async(login_data.password, user_data['password']):
+            # Increment failed attempts and apply the lockout atomically, so concurrent bad attempts can't under-count
+            lockout_time = datetime.now(timezone.utc) + timedelta(minutes=LOGIN_LOCKOUT_MINUTES)
+            attempts = {'$add': [{'$ifNull': ['$failed_login_attempts', 0]}, 1]}
+            updated = await db.users.find_one_and_update(
+                {'id': user_data['id']},
+                [{'$set': {
+                    'failed_login_attempts': attempts,
+                    'locked_until': {'$cond': [{'$gte': [attempts, MAX_LOGIN_ATTEMPTS]}, lockout_time, '$locked_until']}
+                }}],
+                projection={'_id': 0, 'failed_login_attempts': 1},
+                return_document=ReturnDocument.AFTER
+            )
+            failed_attempts = updated['failed_login_attempts'] if updated else 0
             
             if failed_attempts >= MAX_LOGIN_ATTEMPTS:
-                lockout_time = datetime.now(timezone.utc) + timedelta(minutes=LOGIN_LOCKOUT_MINUTES)
-                update_data['locked_until'] = lockout_time.isoformat()
-                logging.warning(f"Account locked for user {login_data.email} due to {failed_attempts} failed attempts")
+                invalidate_user_tokens(user_data['id'])
+                logger.warning("Account locked for user %s due to %s failed attempts", login_data.email, failed_attempts)
             
-            await db.users.update_one({'id': user_data['id']}, {'$set': update_data})
             raise HTTPException(status_code=401, detail="Invalid email or password")
         
         # Reset failed attempts on successful login
+        login_update = {
+            'failed_login_attempts': 0,
+            'last_login': datetime.now(timezone.utc)
+        }
+        
+        # Migrate legacy bcrypt (or outdated Argon2) hashes now that we have the plaintext
+        if password_needs_rehash(user_data['password']):
+            login_update['password'] = await hash_password_async(login_data.password)
+        
         await db.users.update_one(
             {'id': user_data['id']}, 
             {
-                '$set': {
-                    'failed_login_attempts': 0,
-                    'last_login': datetime.now(timezone.utc).isoformat()
-                },
+                '$set': login_update,
                 '$unset': {'locked_until': ''}
             }
         )
         
-        user = User(**parse_from_mongo(user_data))
+        user = User.model_construct(**user_data)
         token = create_access_token({'user_id': user.id})
         
         # Remove sensitive data
-        user_response = user.dict()
+        user_response = user.model_dump()
         user_response.pop('failed_login_attempts', None)
         user_response.pop('locked_until', None)
         
-        logging.info(f"User logged in: {user.email}")
-        return {"token": token, "user": user_response}
+        logger.info("User logged in: %s", user.email)
+        return ORJSONResponse({"token": token, "user": user_response})
         
     except HTTPException:
         raise
     except Exception as e:
-        logging.error(f"Login error: {e}")
+        logger.error("Login error: %s", e)
         raise HTTPException(status_code=500, detail="Login failed")
 
 # Categories endpoints with security
-@api_router.get("/categories", response_model=List[Category])
+@api_router.get("/categories")
 @limiter.limit("100/minute")
 async def get_categories(request: Request):
     try:
-        categories = await db.categories.find({'is_active': True}).sort('sort_order', 1).to_list(length=100)
-        return [Category(**parse_from_mongo(cat)) for cat in categories]
+        cache_key = ('categories',)
+        cached = get_cached_catalog(cache_key)
+        if cached is None:
+            categories = await db.categories.find({'is_active': True}, {'_id': 0}).sort('sort_order', 1).to_list(length=100)
+            cached = cache_catalog(cache_key, orjson.dumps(categories))
+        return catalog_response(request, *cached)
     except Exception as e:
-        logging.error(f"Error fetching categories: {e}")
+        logger.error("Error fetching categories: %s", e)
         raise HTTPException(status_code=500, detail="Failed to fetch categories")
 
-@api_router.post("/categories", response_model=Category)
+@api_router.post("/categories")
 @limiter.limit("10/minute")
 async def create_category(request: Request, category_data: CategoryCreate, current_user: User = Depends(get_admin_user)):
     try:
-        category = Category(**category_data.dict())
-        category_dict = prepare_for_mongo(category.dict())
-        await db.categories.insert_one(category_dict)
-        logging.info(f"Category created by admin {current_user.email}: {category.name}")
-        return category
+        category = Category(**category_data.model_dump())
+        category_dict = category.model_dump()
+        await insert_document(db.categories, category_dict)
+        invalidate_catalog_cache()
+        logger.info("Category created by admin %s: %s", current_user.email, category.name)
+        return ORJSONResponse(category_dict)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Category name already exists")
     except Exception as e:
-        logging.error(f"Error creating category: {e}")
+        logger.error("Error creating category: %s", e)
         raise HTTPException(status_code=500, detail="Failed to create category")
 
 # Products endpoints with security
-@api_router.get("/products", response_model=List[Product])
+@api_router.get("/products")
 @limiter.limit("100/minute")
 async def get_products(request: Request, category_id: Optional[str] = None, featured: Optional[bool] = None):
     try:
+        cache_key = ('products', category_id, featured)
+        cached = get_cached_catalog(cache_key)
+        if cached is not None:
+            return catalog_response(request, *cached)
+        
         query = {'is_available': True}
         if category_id:
             query['category_id'] = category_id
         if featured is not None:
             query['is_featured'] = featured
         
-        products = await db.products.find(query).limit(200).to_list(length=None)
-        return [Product(**parse_from_mongo(product)) for product in products]
+        products = await db.products.find(query, {'_id': 0}).to_list(length=200)
+        return catalog_response(request, *cache_catalog(cache_key, orjson.dumps(products)))
     except Exception as e:
-        logging.error(f"Error fetching products: {e}")
+        logger.error("Error fetching products: %s", e)
         raise HTTPException(status_code=500, detail="Failed to fetch products")
 
-@api_router.get("/products/{product_id}", response_model=Product)
+@api_router.get("/products/{product_id}")
 @limiter.limit("100/minute")
 async def get_product(request: Request, product_id: str):
     try:
         # Validate product_id format
-        if not re.match(r'^[a-f0-9\-]{36}$', product_id):
+        if not is_valid_id(product_id):
             raise HTTPException(status_code=400, detail="Invalid product ID format")
             
-        product_data = await db.products.find_one({'id': product_id, 'is_available': True})
+        product_data = await db.products.find_one({'id': product_id, 'is_available': True}, {'_id': 0})
         if not product_data:
             raise HTTPException(status_code=404, detail="Product not found")
-        return Product(**parse_from_mongo(product_data))
+        return ORJSONResponse(product_data)
     except HTTPException:
         raise
     except Exception as e:
-        logging.error(f"Error fetching product: {e}")
+        logger.error("Error fetching product: %s", e)
         raise HTTPException(status_code=500, detail="Failed to fetch product")
 
-@api_router.post("/products", response_model=Product)
+@api_router.post("/products")
 @limiter.limit("5/minute")
 async def create_product(request: Request, product_data: ProductCreate, current_user: User = Depends(get_admin_user)):
     try:
         # Validate category exists
-        category = await db.categories.find_one({'id': product_data.category_id})
+        category = await db.categories.find_one({'id': product_data.category_id}, {'_id': 1})
         if not category:
             raise HTTPException(status_code=400, detail="Invalid category ID")
             
-        product = Product(**product_data.dict())
-        product_dict = prepare_for_mongo(product.dict())
-        await db.products.insert_one(product_dict)
-        logging.info(f"Product created by admin {current_user.email}: {product.name}")
-        return product
+        product = Product(**product_data.model_dump())
+        product_dict = product.model_dump()
+        await insert_document(db.products, product_dict)
+        invalidate_catalog_cache()
+        logger.info("Product created by admin %s: %s", current_user.email, product.name)
+        return ORJSONResponse(product_dict)
     except HTTPException:
         raise
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Product name already exists")
     except Exception as e:
-        logging.error(f"Error creating product: {e}")
+        logger.error("Error creating product: %s", e)
         raise HTTPException(status_code=500, detail="Failed to create product")
 
-@api_router.put("/products/{product_id}", response_model=Product)
+@api_router.put("/products/{product_id}")
 @limiter.limit("5/minute")
 async def update_product(request: Request, product_id: str, product_data: ProductCreate, current_user: User = Depends(get_admin_user)):
     try:
         # Validate product_id format
-        if not re.match(r'^[a-f0-9\-]{36}$', product_id):
+        if not is_valid_id(product_id):
             raise HTTPException(status_code=400, detail="Invalid product ID format")
             
-        existing_product = await db.products.find_one({'id': product_id})
-        if not existing_product:
-            raise HTTPException(status_code=404, detail="Product not found")
-        
         # Validate category exists
-        category = await db.categories.find_one({'id': product_data.category_id})
+        category = await db.categories.find_one({'id': product_data.category_id}, {'_id': 1})
         if not category:
             raise HTTPException(status_code=400, detail="Invalid category ID")
         
-        updated_product = Product(**{**existing_product, **product_data.dict(), 'id': product_id})
-        product_dict = prepare_for_mongo(updated_product.dict())
-        await db.products.replace_one({'id': product_id}, product_dict)
-        logging.info(f"Product updated by admin {current_user.email}: {product_id}")
-        return updated_product
+        # Set only the editable fields and get the updated document back in the same round-trip
+        updates = product_data.model_dump()
+        if updates['ingredients']:
+            updates['ingredients'] = [sanitize_input(ingredient) for ingredient in updates['ingredients']]
+        product_dict = await db.products.find_one_and_update(
+            {'id': product_id},
+            {'$set': updates},
+            projection={'_id': 0},
+            return_document=ReturnDocument.AFTER
+        )
+        if not product_dict:
+            raise HTTPException(status_code=404, detail="Product not found")
+        
+        invalidate_catalog_cache()
+        logger.info("Product updated by admin %s: %s", current_user.email, product_id)
+        return ORJSONResponse(product_dict)
     except HTTPException:
         raise
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Product name already exists")
     except Exception as e:
-        logging.error(f"Error updating product: {e}")
+        logger.error("Error updating product: %s", e)
         raise HTTPException(status_code=500, detail="Failed to update product")
 
 @api_router.delete("/products/{product_id}")
@@ -530,19 +779,21 @@ async def update_product(request: Request, product_id: str, product_data: Produc
 async def delete_product(request: Request, product_id: str, current_user: User = Depends(get_admin_user)):
     try:
         # Validate product_id format
-        if not re.match(r'^[a-f0-9\-]{36}$', product_id):
+        if not is_valid_id(product_id):
             raise HTTPException(status_code=400, detail="Invalid product ID format")
             
         result = await db.products.delete_one({'id': product_id})
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Product not found")
         
-        logging.info(f"Product deleted by admin {current_user.email}: {product_id}")
+        invalidate_catalog_cache()
+        
+        logger.info("Product deleted by admin %s: %s", current_user.email, product_id)
         return {"message": "Product deleted successfully"}
     except HTTPException:
         raise
     except Exception as e:
-        logging.error(f"Error deleting product: {e}")
+        logger.error("Error deleting product: %s", e)
         raise HTTPException(status_code=500, detail="Failed to delete product")
 
 @api_router.put("/products/{product_id}/availability")
@@ -550,7 +801,7 @@ async def delete_product(request: Request, product_id: str, current_user: User =
 async def toggle_product_availability(request: Request, product_id: str, is_available: bool, current_user: User = Depends(get_admin_user)):
     try:
         # Validate product_id format
-        if not re.match(r'^[a-f0-9\-]{36}$', product_id):
+        if not is_valid_id(product_id):
             raise HTTPException(status_code=400, detail="Invalid product ID format")
             
         result = await db.products.update_one(
@@ -561,17 +812,18 @@ async def toggle_product_availability(request: Request, product_id: str, is_avai
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Product not found")
         
+        invalidate_catalog_cache()
         status = "available" if is_available else "suspended"
-        logging.info(f"Product {status} by admin {current_user.email}: {product_id}")
+        logger.info("Product %s by admin %s: %s", status, current_user.email, product_id)
         return {"message": f"Product {status} successfully"}
     except HTTPException:
         raise
     except Exception as e:
-        logging.error(f"Error updating product availability: {e}")
+        logger.error("Error updating product availability: %s", e)
         raise HTTPException(status_code=500, detail="Failed to update product status")
 
 # Orders endpoints with enhanced security
-@api_router.post("/orders", response_model=Order)
+@api_router.post("/orders")
 @limiter.limit("10/minute")
 async def create_order(request: Request, order_data: OrderCreate, current_user: User = Depends(get_current_user)):
     try:
@@ -579,67 +831,78 @@ async def create_order(request: Request, order_data: OrderCreate, current_user:
         if not order_data.items or len(order_data.items) > 50:
             raise HTTPException(status_code=400, detail="Invalid number of items")
         
-        total_amount = 0
-        validated_items = []
+        # Fetch authoritative prices for every ordered product in one round-trip, keyed by
+        # (product_id, size name) with size None for the base price
+        product_ids = list({item.product_id for item in order_data.items})
+        prices = {}
+        async for product in db.products.find(
+            {'id': {'$in': product_ids}, 'is_available': True},
+            {'_id': 0, 'id': 1, 'price': 1, 'sizes': 1}
+        ):
+            prices[(product['id'], None)] = product['price']
+            for size in product.get('sizes') or []:
+                prices[(product['id'], size['name'])] = size['price']
+        
+        total_amount = 0.0
         
         for item in order_data.items:
             # Validate product exists and is available
-            product = await db.products.find_one({'id': item.product_id, 'is_available': True})
-            if not product:
+            if (item.product_id, None) not in prices:
                 raise HTTPException(status_code=400, detail=f"Product {item.product_id} not available")
             
             # Validate price matches
-            expected_price = item.price
-            if item.size:
-                size_found = False
-                for size in product.get('sizes', []):
-                    if size['name'] == item.size:
-                        expected_price = size['price']
-                        size_found = True
-                        break
-                if not size_found:
-                    raise HTTPException(status_code=400, detail=f"Invalid size for product {item.product_id}")
-            else:
-                expected_price = product['price']
+            expected_price = prices.get((item.product_id, item.size or None))
+            if expected_price is None:
+                raise HTTPException(status_code=400, detail=f"Invalid size for product {item.product_id}")
             
             if abs(item.price - expected_price) > 0.01:
                 raise HTTPException(status_code=400, detail=f"Price mismatch for product {item.product_id}")
             
-            validated_items.append(item)
-            total_amount += item.price * item.quantity
+            # Total from the stored price, never the client-supplied one
+            total_amount += expected_price * item.quantity
         
         order = Order(
             user_id=current_user.id,
-            items=validated_items,
+            items=order_data.items,
             total_amount=round(total_amount, 2),
             delivery_address=order_data.delivery_address,
             phone=order_data.phone,
             notes=order_data.notes
         )
         
-        order_dict = prepare_for_mongo(order.dict())
-        await db.orders.insert_one(order_dict)
+        order_dict = order.model_dump()
+        await insert_document(db.orders, order_dict)
         
-        logging.info(f"Order created by user {current_user.email}: ${total_amount}")
-        return order
+        logger.info("Order created by user %s: $%s", current_user.email, total_amount)
+        return ORJSONResponse(order_dict)
     except HTTPException:
         raise
     except Exception as e:
-        logging.error(f"Error creating order: {e}")
+        logger.error("Error creating order: %s", e)
         raise HTTPException(status_code=500, detail="Failed to create order")
 
-@api_router.get("/orders", response_model=List[Order])
+@api_router.get("/orders")
 @limiter.limit("30/minute")
 async def get_orders(request: Request, current_user: User = Depends(get_current_user)):
     try:
         if current_user.is_admin:
-            orders = await db.orders.find().sort('created_at', -1).limit(200).to_list(length=None)
+            # Join each order's customer in the same round-trip instead of N follow-up user lookups
+            orders = await db.orders.aggregate([
+                {'$sort': {'created_at': -1}},
+                {'$limit': 200},
+                {'$lookup': {'from': 'users', 'localField': 'user_id', 'foreignField': 'id', 'as': 'user'}},
+                {'$unwind': {'path': '$user', 'preserveNullAndEmptyArrays': True}},
+                {'$set': {'user': ADMIN_ORDER_CUSTOMER}},
+                {'$project': {'_id': 0}}
+            ], batchSize=200).to_list(length=200)
         else:
-            orders = await db.orders.find({'user_id': current_user.id}).sort('created_at', -1).limit(50).to_list(length=None)
+            orders = await db.orders.find({'user_id': current_user.id}, USER_ORDER_PROJECTION).sort('created_at', -1).to_list(length=50)
         
-        return [Order(**parse_from_mongo(order)) for order in orders]
+        # Both lists are capped, so fetch them before responding: a DB error still becomes the 500 below
+        # instead of a truncated 200 body
+        return ORJSONResponse(orders)
     except Exception as e:
-        logging.error(f"Error fetching orders: {e}")
+        logger.error("Error fetching orders: %s", e)
         raise HTTPException(status_code=500, detail="Failed to fetch orders")
 
 @api_router.put("/orders/{order_id}/status")
@@ -647,51 +910,55 @@ async def get_orders(request: Request, current_user: User = Depends(get_current_
 async def update_order_status(request: Request, order_id: str, status: str, current_user: User = Depends(get_admin_user)):
     try:
         # Validate order_id format
-        if not re.match(r'^[a-f0-9\-]{36}$', order_id):
+        if not is_valid_id(order_id):
             raise HTTPException(status_code=400, detail="Invalid order ID format")
             
-        valid_statuses = ["pending", "confirmed", "preparing", "ready", "delivered", "cancelled"]
-        if status not in valid_statuses:
+        if status not in VALID_ORDER_STATUSES:
             raise HTTPException(status_code=400, detail="Invalid status")
         
         result = await db.orders.update_one(
             {'id': order_id}, 
-            {'$set': {'status': status, 'updated_at': datetime.now(timezone.utc).isoformat()}}
+            {'$set': {'status': status}, '$currentDate': {'updated_at': True}}
         )
         
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Order not found")
         
-        logging.info(f"Order status updated by admin {current_user.email}: {order_id} -> {status}")
+        logger.info("Order status updated by admin %s: %s -> %s", current_user.email, order_id, status)
         return {"message": "Order status updated successfully"}
     except HTTPException:
         raise
     except Exception as e:
-        logging.error(f"Error updating order status: {e}")
+        logger.error("Error updating order status: %s", e)
         raise HTTPException(status_code=500, detail="Failed to update order status")
 
 # Categories CRUD for admin
-@api_router.put("/categories/{category_id}", response_model=Category)
+@api_router.put("/categories/{category_id}")
 @limiter.limit("5/minute")
 async def update_category(request: Request, category_id: str, category_data: CategoryCreate, current_user: User = Depends(get_admin_user)):
     try:
         # Validate category_id format
-        if not re.match(r'^[a-f0-9\-]{36}$', category_id):
+        if not is_valid_id(category_id):
             raise HTTPException(status_code=400, detail="Invalid category ID format")
             
-        existing_category = await db.categories.find_one({'id': category_id})
-        if not existing_category:
+        category_dict = await db.categories.find_one_and_update(
+            {'id': category_id},
+            {'$set': category_data.model_dump()},
+            projection={'_id': 0},
+            return_document=ReturnDocument.AFTER
+        )
+        if not category_dict:
             raise HTTPException(status_code=404, detail="Category not found")
         
-        updated_category = Category(**{**existing_category, **category_data.dict(), 'id': category_id})
-        category_dict = prepare_for_mongo(updated_category.dict())
-        await db.categories.replace_one({'id': category_id}, category_dict)
-        logging.info(f"Category updated by admin {current_user.email}: {category_id}")
-        return updated_category
+        invalidate_catalog_cache()
+        logger.info("Category updated by admin %s: %s", current_user.email, category_id)
+        return ORJSONResponse(category_dict)
     except HTTPException:
         raise
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Category name already exists")
     except Exception as e:
-        logging.error(f"Error updating category: {e}")
+        logger.error("Error updating category: %s", e)
         raise HTTPException(status_code=500, detail="Failed to update category")
 
 @api_router.delete("/categories/{category_id}")
@@ -699,208 +966,407 @@ async def update_category(request: Request, category_id: str, category_data: Cat
 async def delete_category(request: Request, category_id: str, current_user: User = Depends(get_admin_user)):
     try:
         # Validate category_id format
-        if not re.match(r'^[a-f0-9\-]{36}$', category_id):
+        if not is_valid_id(category_id):
             raise HTTPException(status_code=400, detail="Invalid category ID format")
             
         # Check if category has products
-        product_count = await db.products.count_documents({'category_id': category_id})
-        if product_count > 0:
+        has_products = await db.products.find_one({'category_id': category_id}, {'_id': 1})
+        if has_products:
             raise HTTPException(status_code=400, detail="Cannot delete category with existing products")
         
         result = await db.categories.delete_one({'id': category_id})
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Category not found")
         
-        logging.info(f"Category deleted by admin {current_user.email}: {category_id}")
+        invalidate_catalog_cache()
+        
+        logger.info("Category deleted by admin %s: %s", current_user.email, category_id)
         return {"message": "Category deleted successfully"}
     except HTTPException:
         raise
     except Exception as e:
-        logging.error(f"Error deleting category: {e}")
+        logger.error("Error deleting category: %s", e)
         raise HTTPException(status_code=500, detail="Failed to delete category")
 
-# Secure initialization endpoint
-@api_router.post("/init-data")
-@limiter.limit("1/minute")
-async def initialize_sample_data(request: Request):
+# Precomputed Argon2id hash of the seed admin password; login upgrades it if the Argon2 parameters change
+SEED_ADMIN_PASSWORD_HASH = '$argon2id$v=19$m=65536,t=3,p=4$IZpJF9Xn0LWwAzyGxU2tSg$RUyQmjSmY/k7s65Kny1glPRXHnCTlNaVxllj207Farg'
+
+# Sample menu seed data (built once at import; products name their category).
+# Kept pre-sanitized and within field limits: init-data builds documents without re-validating them.
+CATEGORIES_SEED = (
+    {"name": "Pizza", "description": "Our delicious handcrafted pizzas", "sort_order": 1, "image_url": "https://images.unsplash.com/photo-1593504049359-74330189a345"},
+    {"name": "Pasta", "description": "Authentic Italian pasta dishes", "sort_order": 2, "image_url": "https://images.unsplash.com/photo-1563245738-9169ff58eccf"},
+    {"name": "Appetizers", "description": "Start your meal right", "sort_order": 3, "image_url": "https://images.unsplash.com/photo-1541014741259-de529411b96a"},
+    {"name": "Wings", "description": "Crispy chicken wings with your favorite sauce", "sort_order": 4, "image_url": "https://images.unsplash.com/photo-1608039829572-78524f79c4c7"},
+    {"name": "Salads", "description": "Fresh garden salads", "sort_order": 5, "image_url": "https://images.unsplash.com/photo-1512621776951-a57141f2eefd"},
+    {"name": "Burgers", "description": "Juicy grilled burgers", "sort_order": 6, "image_url": "https://images.unsplash.com/photo-1568901346375-23c9450c58cd"},
+    {"name": "Hot Subs", "description": "Hot submarine sandwiches", "sort_order": 7, "image_url": "https://images.unsplash.com/photo-1539252554453-80ab65ce3586"},
+    {"name": "Cold Subs", "description": "Fresh cold submarine sandwiches", "sort_order": 8, "image_url": "https://images.unsplash.com/photo-1555072956-7758afb20e8f"},
+    {"name": "Calzone", "description": "Stuffed pizza pockets", "sort_order": 9, "image_url": "https://images.unsplash.com/photo-1571019613454-1cb2f99b2d8b"},
+    {"name": "Stromboli", "description": "Rolled and baked pizza", "sort_order": 10, "image_url": "https://images.unsplash.com/photo-1571019613454-1cb2f99b2d8b"},
+    {"name": "Gyros", "description": "Mediterranean style gyros", "sort_order": 11, "image_url": "https://images.unsplash.com/photo-1621996346565-e3dbc691d8e9"},
+    {"name": "Sides", "description": "Perfect sides for your meal", "sort_order": 12, "image_url": "https://images.unsplash.com/photo-1573080496219-bb080dd4f877"},
+    {"name": "Desserts", "description": "Sweet treats to finish your meal", "sort_order": 13, "image_url": "https://images.unsplash.com/photo-1551024601-bec78aea704b"}
+)
+
+PRODUCTS_SEED = (
+    # PIZZAS - CORRECT PRICES AND INGREDIENTS
+    {
+        "name": "NY Cheese Pizza",
+        "description": "Classic cheese pizza",
+        "category": "Pizza",
+        "price": 18.95,
+        "image_url": "https://images.unsplash.com/photo-1513104890138-7c749659a591",
+        "ingredients": ["Mozzarella cheese", "Tomato sauce"],
+        "sizes": [
+            {"name": "Medium 12\"", "price": 16.95},
+            {"name": "Large 14\"", "price": 18.95},
+            {"name": "Extra Large 18\"", "price": 20.95}
+        ],
+        "is_featured": True
+    },
+    {
+        "name": "Deluxe Pizza",
+        "description": "Pepperoni, sausage, ham, bacon, mushrooms, onions, green peppers, black olives",
+        "category": "Pizza",
+        "price": 23.95,
+        "image_url": "https://images.unsplash.com/photo-1595708684082-a173bb3a06c5",
+        "ingredients": ["Pepperoni", "Sausage", "Ham", "Bacon", "Mushrooms", "Onions", "Green peppers", "Black olives"],
+        "sizes": [
+            {"name": "Medium 12\"", "price": 20.95},
+            {"name": "Large 14\"", "price": 23.95},
+            {"name": "Extra Large 18\"", "price": 26.95}
+        ],
+        "is_featured": True
+    },
+    {
+        "name": "Meat Lovers Pizza",
+        "description": "Pepperoni, ham, bacon",
+        "category": "Pizza",
+        "price": 22.95,
+        "image_url": "https://images.unsplash.com/photo-1628840042765-356cda07504e",
+        "ingredients": ["Pepperoni", "Ham", "Bacon"],
+        "sizes": [
+            {"name": "Medium 12\"", "price": 19.95},
+            {"name": "Large 14\"", "price": 22.95},
+            {"name": "Extra Large 18\"", "price": 24.95}
+        ],
+        "is_featured": True
+    },
+    # Additional menu items...
+    {
+        "name": "Homemade Meat Lasagna",
+        "description": "Layers of pasta, meat sauce, and three cheeses",
+        "category": "Pasta",
+        "price": 15.95,
+        "image_url": "https://images.unsplash.com/photo-1571997478779-2adcbbe9ab2f",
+        "ingredients": ["Ground beef", "Pasta sheets", "Ricotta", "Mozzarella", "Parmesan"]
+    },
+    {
+        "name": "Mozzarella Sticks",
+        "description": "Golden fried mozzarella sticks served with marinara sauce",
+        "category": "Appetizers",
+        "price": 9.95,
+        "image_url": "https://images.unsplash.com/photo-1541014741259-de529411b96a",
+        "ingredients": ["Mozzarella cheese", "Breadcrumbs", "Marinara sauce"]
+    }
+)
+
+def upserted_object_ids(result) -> list:
+    """_ids a seed bulk_write inserted (rather than replaced), including the partial upserts of a BulkWriteError"""
+    if isinstance(result, BulkWriteError):
+        return [upsert['_id'] for upsert in result.details.get('upserted', [])]
+    if isinstance(result, BaseException):
+        # Unknown outcome: keep everything rather than risk deleting documents the seed only replaced
+        return []
+    return list(result.upserted_ids.values())
+
+async def seed_sample_data() -> bool:
+    """Seed the sample menu and admin once; returns False if data exists or another seed is running"""
+    if await db.categories.estimated_document_count() > 0:
+        return False
+    
+    # Claim a sentinel so concurrent requests and workers can't seed twice; a TTL index clears it after a crash
     try:
-        # Check if data already exists
-        category_count = await db.categories.count_documents({})
-        if category_count > 0:
-            return {"message": "Sample data already exists"}
+        await db.meta.insert_one({'_id': SEED_SENTINEL_ID, 'created_at': datetime.now(timezone.utc)})
+    except DuplicateKeyError:
+        return False
+    
+    try:
+        # Re-check under the sentinel: another seed may have finished since the first count
+        if await db.categories.estimated_document_count() > 0:
+            return False
         
-        # Clear existing data
-        await db.categories.delete_many({})
-        await db.products.delete_many({})
-        
-        # Create all categories
-        categories_data = [
-            {"name": "Pizza", "description": "Our delicious handcrafted pizzas", "sort_order": 1, "image_url": "https://images.unsplash.com/photo-1593504049359-74330189a345"},
-            {"name": "Pasta", "description": "Authentic Italian pasta dishes", "sort_order": 2, "image_url": "https://images.unsplash.com/photo-1563245738-9169ff58eccf"},
-            {"name": "Appetizers", "description": "Start your meal right", "sort_order": 3, "image_url": "https://images.unsplash.com/photo-1541014741259-de529411b96a"},
-            {"name": "Wings", "description": "Crispy chicken wings with your favorite sauce", "sort_order": 4, "image_url": "https://images.unsplash.com/photo-1608039829572-78524f79c4c7"},
-            {"name": "Salads", "description": "Fresh garden salads", "sort_order": 5, "image_url": "https://images.unsplash.com/photo-1512621776951-a57141f2eefd"},
-            {"name": "Burgers", "description": "Juicy grilled burgers", "sort_order": 6, "image_url": "https://images.unsplash.com/photo-1568901346375-23c9450c58cd"},
-            {"name": "Hot Subs", "description": "Hot submarine sandwiches", "sort_order": 7, "image_url": "https://images.unsplash.com/photo-1539252554453-80ab65ce3586"},
-            {"name": "Cold Subs", "description": "Fresh cold submarine sandwiches", "sort_order": 8, "image_url": "https://images.unsplash.com/photo-1555072956-7758afb20e8f"},
-            {"name": "Calzone", "description": "Stuffed pizza pockets", "sort_order": 9, "image_url": "https://images.unsplash.com/photo-1571019613454-1cb2f99b2d8b"},
-            {"name": "Stromboli", "description": "Rolled and baked pizza", "sort_order": 10, "image_url": "https://images.unsplash.com/photo-1571019613454-1cb2f99b2d8b"},
-            {"name": "Gyros", "description": "Mediterranean style gyros", "sort_order": 11, "image_url": "https://images.unsplash.com/photo-1621996346565-e3dbc691d8e9"},
-            {"name": "Sides", "description": "Perfect sides for your meal", "sort_order": 12, "image_url": "https://images.unsplash.com/photo-1573080496219-bb080dd4f877"},
-            {"name": "Desserts", "description": "Sweet treats to finish your meal", "sort_order": 13, "image_url": "https://images.unsplash.com/photo-1551024601-bec78aea704b"}
-        ]
+        # Create all categories (one shared timestamp for the whole seed)
+        seeded_at = datetime.now(timezone.utc)
+        categories = [Category.model_construct(created_at=seeded_at, **cat_data).model_dump() for cat_data in CATEGORIES_SEED]
         
-        categories = []
-        for cat_data in categories_data:
-            category = Category(**cat_data)
-            categories.append(prepare_for_mongo(category.dict()))
-        
-        await db.categories.insert_many(categories)
-        
-        # Get category IDs
-        pizza_cat = await db.categories.find_one({"name": "Pizza"})
-        pasta_cat = await db.categories.find_one({"name": "Pasta"})
-        appetizers_cat = await db.categories.find_one({"name": "Appetizers"})
-        wings_cat = await db.categories.find_one({"name": "Wings"})
-        salads_cat = await db.categories.find_one({"name": "Salads"})
-        burgers_cat = await db.categories.find_one({"name": "Burgers"})
-        hot_subs_cat = await db.categories.find_one({"name": "Hot Subs"})
-        cold_subs_cat = await db.categories.find_one({"name": "Cold Subs"})
-        calzone_cat = await db.categories.find_one({"name": "Calzone"})
-        stromboli_cat = await db.categories.find_one({"name": "Stromboli"})
-        gyros_cat = await db.categories.find_one({"name": "Gyros"})
-        sides_cat = await db.categories.find_one({"name": "Sides"})
-        desserts_cat = await db.categories.find_one({"name": "Desserts"})
+        # Category IDs are generated client-side, so no lookup is needed after insert
+        category_ids = {cat['name']: cat['id'] for cat in categories}
         
         # Create complete product data - SECURE MENU DATA
-        products_data = [
-            # PIZZAS - CORRECT PRICES AND INGREDIENTS
-            {
-                "name": "NY Cheese Pizza",
-                "description": "Classic cheese pizza",
-                "category_id": pizza_cat['id'],
-                "price": 18.95,
-                "image_url": "https://images.unsplash.com/photo-1513104890138-7c749659a591",
-                "ingredients": ["Mozzarella cheese", "Tomato sauce"],
-                "sizes": [
-                    {"name": "Medium 12\"", "price": 16.95},
-                    {"name": "Large 14\"", "price": 18.95},
-                    {"name": "Extra Large 18\"", "price": 20.95}
-                ],
-                "is_featured": True
-            },
-            {
-                "name": "Deluxe Pizza",
-                "description": "Pepperoni, sausage, ham, bacon, mushrooms, onions, green peppers, black olives",
-                "category_id": pizza_cat['id'],
-                "price": 23.95,
-                "image_url": "https://images.unsplash.com/photo-1595708684082-a173bb3a06c5",
-                "ingredients": ["Pepperoni", "Sausage", "Ham", "Bacon", "Mushrooms", "Onions", "Green peppers", "Black olives"],
-                "sizes": [
-                    {"name": "Medium 12\"", "price": 20.95},
-                    {"name": "Large 14\"", "price": 23.95},
-                    {"name": "Extra Large 18\"", "price": 26.95}
-                ],
-                "is_featured": True
-            },
-            {
-                "name": "Meat Lover's Pizza",
-                "description": "Pepperoni, ham, bacon",
-                "category_id": pizza_cat['id'],
-                "price": 22.95,
-                "image_url": "https://images.unsplash.com/photo-1628840042765-356cda07504e",
-                "ingredients": ["Pepperoni", "Ham", "Bacon"],
-                "sizes": [
-                    {"name": "Medium 12\"", "price": 19.95},
-                    {"name": "Large 14\"", "price": 22.95},
-                    {"name": "Extra Large 18\"", "price": 24.95}
-                ],
-                "is_featured": True
-            },
-            # Additional menu items...
-            {
-                "name": "Homemade Meat Lasagna",
-                "description": "Layers of pasta, meat sauce, and three cheeses",
-                "category_id": pasta_cat['id'],
-                "price": 15.95,
-                "image_url": "https://images.unsplash.com/photo-1571997478779-2adcbbe9ab2f",
-                "ingredients": ["Ground beef", "Pasta sheets", "Ricotta", "Mozzarella", "Parmesan"]
-            },
-            {
-                "name": "Mozzarella Sticks",
-                "description": "Golden fried mozzarella sticks served with marinara sauce",
-                "category_id": appetizers_cat['id'],
-                "price": 9.95,
-                "image_url": "https://images.unsplash.com/photo-1541014741259-de529411b96a",
-                "ingredients": ["Mozzarella cheese", "Breadcrumbs", "Marinara sauce"]
-            }
+        products = [
+            Product.model_construct(
+                category_id=category_ids[prod_data['category']],
+                created_at=seeded_at,
+                **{key: value for key, value in prod_data.items() if key != 'category'}
+            ).model_dump()
+            for prod_data in PRODUCTS_SEED
         ]
         
-        products = []
-        for prod_data in products_data:
-            product = Product(**prod_data)
-            products.append(prepare_for_mongo(product.dict()))
-        
-        await db.products.insert_many(products)
-        
-        # Create secure admin user
-        admin_password = hash_password('NYPizza@Admin2025!')
+        # Build (and validate) the admin before the first write so a bad record can't leave a half-seeded menu
         admin_user = User(
             email='admin@pizzashop.com',
             full_name='System Administrator',
-            phone='(470) 545-0095',
+            phone='4705450095',
             is_admin=True
         )
+        admin_dict = {**admin_user.model_dump(), 'password': SEED_ADMIN_PASSWORD_HASH}
         
-        admin_dict = prepare_for_mongo(admin_user.dict())
-        admin_dict['password'] = admin_password
-        
-        # Check if admin already exists
-        existing_admin = await db.users.find_one({'email': admin_user.email})
-        if not existing_admin:
-            await db.users.insert_one(admin_dict)
+        # Upsert categories and products by their unique name (no full-collection delete first) while upserting the admin
+        # (keyed on the unique email, so an existing admin is kept)
+        category_result, product_result, admin_result = await asyncio.gather(
+            db.get_collection('categories', write_concern=SEED_WRITE_CONCERN).bulk_write(
+                [ReplaceOne({'name': cat['name']}, cat, upsert=True) for cat in categories], ordered=False
+            ),
+            db.get_collection('products', write_concern=SEED_WRITE_CONCERN).bulk_write(
+                [ReplaceOne({'name': product['name']}, product, upsert=True) for product in products], ordered=False
+            ),
+            db.users.update_one({'email': admin_user.email}, {'$setOnInsert': admin_dict}, upsert=True),
+            return_exceptions=True
+        )
+        failure = next((r for r in (category_result, product_result, admin_result) if isinstance(r, BaseException)), None)
+        if failure is not None:
+            # Standalone Mongo has no multi-document transactions; undo the partial seed so init can be retried.
+            # Only documents this seed inserted are removed: a replaced same-named document took a seed id but predates it
+            await asyncio.gather(
+                db.categories.delete_many({'_id': {'$in': upserted_object_ids(category_result)}}),
+                db.products.delete_many({'_id': {'$in': upserted_object_ids(product_result)}}),
+                return_exceptions=True
+            )
+            raise failure
         
-        logging.info("Sample data initialized successfully")
+        invalidate_catalog_cache()
+        logger.info("Sample data initialized successfully")
+        return True
+    finally:
+        await db.meta.delete_one({'_id': SEED_SENTINEL_ID})
+
+# Secure initialization endpoint
+@api_router.post("/init-data")
+@limiter.limit("1/minute")
+async def initialize_sample_data(request: Request):
+    try:
+        if not await seed_sample_data():
+            return {"message": "Sample data already exists"}
         return {"message": "Complete menu data initialized successfully. Admin login: admin@pizzashop.com / NYPizza@Admin2025!"}
         
     except Exception as e:
-        logging.error(f"Error initializing data: {e}")
+        logger.error("Error initializing data: %s", e)
         raise HTTPException(status_code=500, detail="Failed to initialize data")
 
-# Include the router in the main app
-app.include_router(api_router)
-
-# CORS with security
+# CORS with security (added last, so it is outermost and answers preflights before any other middleware)
 app.add_middleware(
     CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=["https://crust-corner.preview.emergentagent.com", "http://localhost:3000"],
+    allow_credentials=CORS_ALLOW_CREDENTIALS,
+    allow_origins=CORS_ORIGINS,
+    allow_origin_regex=CORS_ORIGIN_REGEX,
     allow_methods=["GET", "POST", "PUT", "DELETE"],
-    allow_headers=["*"],
-    expose_headers=["*"]
+    # Only the headers the frontend actually sends; browsers may cache the preflight for a day
+    allow_headers=["Authorization", "Content-Type"],
+    max_age=86400
 )
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('pizza_app.log'),
-        logging.StreamHandler()
+# Include the router in the main app
+app.include_router(api_router)
+
+# Configure logging: handlers only enqueue; a listener thread formats and writes to file/stderr off the event loop
+log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', '1'))
+if WEB_CONCURRENCY == 1:
+    log_file_handler = RotatingFileHandler(
+        'pizza_app.log',
+        maxBytes=int(os.environ.get('LOG_MAX_BYTES', str(10 * 1024 * 1024))),
+        backupCount=int(os.environ.get('LOG_BACKUP_COUNT', '5'))
+    )
+else:
+    # Several workers rotating one file would rename it under each other; leave rotation to an external
+    # logrotate and just reopen the file when it moves
+    log_file_handler = WatchedFileHandler('pizza_app.log')
+log_handlers = [log_file_handler, logging.StreamHandler()]
+for log_handler in log_handlers:
+    log_handler.setFormatter(log_formatter)
+log_queue = queue.SimpleQueue()
+log_listener = QueueListener(log_queue, *log_handlers, respect_handler_level=True)
+# The queue side keeps only the bare message (prepare() bakes it into record.msg); the listener's handlers add the prefix once
+log_queue_handler = QueueHandler(log_queue)
+log_queue_handler.setFormatter(logging.Formatter('%(message)s'))
+root_logger = logging.getLogger()
+root_logger.addHandler(log_queue_handler)
+root_logger.setLevel(logging.INFO)
+log_listener.start()
+
+async def ensure_indexes():
+    """Create the indexes backing every query filter and sort used by the API"""
+    await asyncio.gather(
+        db.users.create_index('email', unique=True),
+        db.users.create_index('id', unique=True),
+        db.categories.create_index('id', unique=True),
+        db.categories.create_index([('is_active', 1), ('sort_order', 1)]),
+        db.products.create_index('id', unique=True),
+        db.products.create_index([('is_available', 1), ('category_id', 1), ('is_featured', 1)]),
+        db.products.create_index([('is_available', 1), ('is_featured', 1)]),
+        db.products.create_index('category_id'),
+        db.orders.create_index('id', unique=True),
+        db.orders.create_index([('user_id', 1), ('created_at', -1)]),
+        db.orders.create_index([('created_at', -1)]),
+        db.meta.create_index('created_at', expireAfterSeconds=300),
+    )
+
+async def prepare_database():
+    """Connect and build indexes, retrying while Mongo is unreachable; the unique indexes are what reject
+    duplicate emails and ids, so the app must not serve requests without them"""
+    for attempt in range(1, DB_PREPARE_ATTEMPTS + 1):
+        try:
+            # Ping forces the pool to connect now instead of on the first request
+            await client.admin.command('ping')
+            await ensure_indexes()
+            return
+        except ConnectionFailure as e:
+            if attempt == DB_PREPARE_ATTEMPTS:
+                raise
+            delay = min(2 ** attempt, 30)
+            logger.warning("Database unavailable (attempt %s/%s), retrying in %ss: %s", attempt, DB_PREPARE_ATTEMPTS, delay, e)
+            await asyncio.sleep(delay)
+
+async def migrate_collection_dates(name: str, fields: Tuple[str, ...]) -> int:
+    """Rewrite one collection's ISO-string dates as BSON dates; returns the number of documents updated"""
+    collection = db[name]
+    updates = []
+    query = {'$or': [{field: {'$type': 'string'}} for field in fields]}
+    async for doc in collection.find(query, {field: 1 for field in fields}):
+        changes = {}
+        for field in fields:
+            if isinstance(doc.get(field), str):
+                try:
+                    value = datetime.fromisoformat(doc[field])
+                except ValueError:
+                    logger.warning("Unparseable %s.%s on %s left as is", name, field, doc['_id'])
+                    continue
+                changes[field] = value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+        if changes:
+            updates.append(UpdateOne({'_id': doc['_id']}, {'$set': changes}))
+    if updates:
+        await collection.bulk_write(updates, ordered=False)
+    return len(updates)
+
+async def migrate_legacy_dates():
+    """Convert dates written as ISO strings by older releases so sorts and responses see one type"""
+    if await db.meta.find_one({'_id': DATES_MIGRATED_ID}, {'_id': 1}):
+        return
+    counts = await asyncio.gather(*(migrate_collection_dates(name, fields) for name, fields in LEGACY_DATE_FIELDS))
+    # No created_at on the marker, so the meta TTL index never expires it and later boots skip the scans
+    await db.meta.update_one({'_id': DATES_MIGRATED_ID}, {'$set': {'migrated_at': datetime.now(timezone.utc)}}, upsert=True)
+    logger.info("Legacy string dates migrated: %s", dict(zip((name for name, _ in LEGACY_DATE_FIELDS), counts)))
+
+async def find_duplicate_names(name: str) -> List[dict]:
+    """Group a collection's documents sharing a name, oldest first; returns the kept id and the ids to drop"""
+    pipeline = [
+        {'$sort': {'created_at': 1, '_id': 1}},
+        {'$group': {'_id': '$name', 'keep': {'$first': '$id'}, 'ids': {'$push': '$id'}, 'count': {'$sum': 1}}},
+        {'$match': {'count': {'$gt': 1}}},
     ]
-)
-logger = logging.getLogger(__name__)
+    groups = await db[name].aggregate(pipeline).to_list(length=None)
+    return [{'keep': group['keep'], 'drop': group['ids'][1:]} for group in groups]
+
+async def dedupe_catalog_names():
+    """Remove same-named categories and products left by older unguarded seeds, keeping the oldest of each"""
+    if await db.meta.find_one({'_id': CATALOG_DEDUPED_ID}, {'_id': 1}):
+        return
+    category_groups, product_groups = await asyncio.gather(find_duplicate_names('categories'), find_duplicate_names('products'))
+    # Repoint products at the kept category before its duplicates go away
+    category_moves = [
+        UpdateMany({'category_id': {'$in': group['drop']}}, {'$set': {'category_id': group['keep']}})
+        for group in category_groups
+    ]
+    if category_moves:
+        await db.products.bulk_write(category_moves, ordered=False)
+    dropped_categories = [cat_id for group in category_groups for cat_id in group['drop']]
+    dropped_products = [product_id for group in product_groups for product_id in group['drop']]
+    await asyncio.gather(
+        db.categories.delete_many({'id': {'$in': dropped_categories}}),
+        db.products.delete_many({'id': {'$in': dropped_products}}),
+    )
+    await db.meta.update_one({'_id': CATALOG_DEDUPED_ID}, {'$set': {'deduped_at': datetime.now(timezone.utc)}}, upsert=True)
+    logger.info("Duplicate catalog names removed: %s categories, %s products", len(dropped_categories), len(dropped_products))
+
+async def ensure_catalog_name_indexes():
+    """Build the unique name indexes the seed upserts are keyed on, after clearing any duplicates that would block them"""
+    await dedupe_catalog_names()
+    await asyncio.gather(
+        db.categories.create_index('name', unique=True),
+        db.products.create_index('name', unique=True),
+    )
+
+async def seed_on_startup():
+    try:
+        await seed_sample_data()
+    except Exception as e:
+        logger.error("Error seeding sample data: %s", e)
 
 @app.on_event("startup")
 async def startup_event():
+    global password_hasher
+    try:
+        await prepare_database()
+    except Exception as e:
+        # Fail startup rather than run without the unique indexes (e.g. existing duplicates block the build)
+        logger.critical("Error preparing database: %s", e)
+        raise
+    try:
+        await migrate_legacy_dates()
+    except Exception as e:
+        # Not fatal: unmigrated documents still load, they just sort after migrated ones until the next boot
+        logger.error("Error migrating legacy dates: %s", e)
+    try:
+        await ensure_catalog_name_indexes()
+    except Exception as e:
+        # Not fatal either: without them only duplicate catalog names go unchecked, unlike the users/id indexes
+        logger.error("Error building catalog name indexes: %s", e)
+    if PASSWORD_HASH_BUDGET_MS > 0:
+        loop = asyncio.get_running_loop()
+        time_cost = await loop.run_in_executor(None, tune_argon2_time_cost, PASSWORD_HASH_BUDGET_MS)
+        password_hasher = PasswordHasher(time_cost=time_cost, memory_cost=ARGON2_MEMORY_COST, parallelism=ARGON2_PARALLELISM)
+        logger.info("Argon2 time cost tuned to %s for a %sms budget", time_cost, PASSWORD_HASH_BUDGET_MS)
+    if SEED_SAMPLE_DATA:
+        # Seed in the background so startup (and /health) isn't held up by hashing and inserts
+        app.state.seed_task = asyncio.create_task(seed_on_startup())
     logger.info("Pizza ordering system started with enhanced security")
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
+    password_executor.shutdown(wait=False)
     logger.info("Database connection closed")
+    log_listener.stop()  # flushes queued records
 
 # Health check endpoint
+@lru_cache(maxsize=2)
+def iso_timestamp(epoch_second: int) -> str:
+    """Format a whole-second UTC timestamp; cached so frequent probes reuse the string"""
+    return datetime.fromtimestamp(epoch_second, timezone.utc).isoformat()
+
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "timestamp": datetime.now(timezone.utc).isoformat()}
\ No newline at end of file
+    return {"status": "healthy", "timestamp": iso_timestamp(int(time.time()))}
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(
+        "server:app",
+        host=os.environ.get('HOST', '0.0.0.0'),
+        port=int(os.environ.get('PORT', '8001')),
+        loop="auto",  # uvloop when installed (not on Windows, see requirements.txt), asyncio otherwise
+        http="httptools",
+        workers=WEB_CONCURRENCY
+    )
@@ -1,6 +1,10 @@
 import requests
+from requests.adapters import HTTPAdapter
 import sys
 import json
+import orjson
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 class PizzaAPITester:
@@ -12,7 +16,15 @@ class PizzaAPITester:
         self.tests_run = 0
         self.tests_passed = 0
         self.user_id = None
+        self.test_email = None
+        self.test_password = None
         self.admin_id = None
+        # Reuse one keep-alive connection pool instead of a new TCP+TLS handshake per request
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        # Counters are shared by tests running concurrently in main()
+        self.lock = threading.Lock()
 
     def run_test(self, name, method, endpoint, expected_status, data=None, headers=None):
         """Run a single API test"""
@@ -25,37 +37,37 @@ class PizzaAPITester:
         if self.token and not headers:
             test_headers['Authorization'] = f'Bearer {self.token}'
 
-        self.tests_run += 1
+        with self.lock:
+            self.tests_run += 1
         print(f"\n🔍 Testing {name}...")
         print(f"   URL: {url}")
         
         try:
-            if method == 'GET':
-                response = requests.get(url, headers=test_headers, timeout=10)
-            elif method == 'POST':
-                response = requests.post(url, json=data, headers=test_headers, timeout=10)
-            elif method == 'PUT':
-                response = requests.put(url, json=data, headers=test_headers, timeout=10)
+            response = self.session.request(method, url, json=data, headers=test_headers, timeout=10)
+
+            # Parse the body once and reuse it for both the report and the return value
+            try:
+                response_data = orjson.loads(response.content)
+            except orjson.JSONDecodeError:
+                response_data = None
 
             success = response.status_code == expected_status
             if success:
-                self.tests_passed += 1
+                with self.lock:
+                    self.tests_passed += 1
                 print(f"✅ Passed - Status: {response.status_code}")
-                try:
-                    response_data = response.json()
-                    if isinstance(response_data, dict) and len(str(response_data)) < 500:
-                        print(f"   Response: {response_data}")
-                    elif isinstance(response_data, list):
-                        print(f"   Response: List with {len(response_data)} items")
-                    return True, response_data
-                except:
+                if response_data is None:
                     return True, {}
+                if isinstance(response_data, dict) and len(str(response_data)) < 500:
+                    print(f"   Response: {response_data}")
+                elif isinstance(response_data, list):
+                    print(f"   Response: List with {len(response_data)} items")
+                return True, response_data
             else:
                 print(f"❌ Failed - Expected {expected_status}, got {response.status_code}")
-                try:
-                    error_data = response.json()
-                    print(f"   Error: {error_data}")
-                except:
+                if response_data is not None:
+                    print(f"   Error: {response_data}")
+                else:
                     print(f"   Error: {response.text}")
                 return False, {}
 
@@ -122,7 +134,7 @@ class PizzaAPITester:
             "email": f"test_user_{timestamp}@example.com",
             "password": "TestPass123!",
             "full_name": "Test User",
-            "phone": "555-0123",
+            "phone": "5550123456",
             "address": "123 Test Street, Test City"
         }
         
@@ -137,36 +149,22 @@ class PizzaAPITester:
         if success and 'token' in response and 'user' in response:
             self.token = response['token']
             self.user_id = response['user']['id']
+            # Reused by the login test instead of registering (and hashing) a second user
+            self.test_email = user_data["email"]
+            self.test_password = user_data["password"]
             print(f"   User registered with ID: {self.user_id}")
             return True
         return False
 
     def test_user_login(self):
-        """Test user login with existing user"""
-        # First register a user for login test
-        timestamp = datetime.now().strftime('%H%M%S')
-        user_data = {
-            "email": f"login_test_{timestamp}@example.com", 
-            "password": "TestPass123!",
-            "full_name": "Login Test User"
-        }
-        
-        # Register user
-        reg_success, reg_response = self.run_test(
-            "Register User for Login Test",
-            "POST",
-            "auth/register", 
-            200,
-            data=user_data
-        )
-        
-        if not reg_success:
+        """Test user login with the user created by the registration test"""
+        if not self.test_email:
+            print("❌ No registered user available for login test")
             return False
             
-        # Now test login
         login_data = {
-            "email": user_data["email"],
-            "password": user_data["password"]
+            "email": self.test_email,
+            "password": self.test_password
         }
         
         success, response = self.run_test(
@@ -287,29 +285,41 @@ def main():
     
     tester = PizzaAPITester()
     
-    # Test sequence
-    tests = [
-        ("Initialize Sample Data", tester.test_init_data),
-        ("Get Categories", tester.test_get_categories), 
-        ("Get Products", tester.test_get_products),
-        ("Get Featured Products", tester.test_get_featured_products),
-        ("User Registration", tester.test_user_registration),
-        ("User Login", tester.test_user_login),
-        ("Create Order", tester.test_create_order),
-        ("Get Orders", tester.test_get_orders),
-        ("Admin Functionality", tester.test_admin_functionality),
-        ("Invalid Endpoints", tester.test_invalid_endpoints)
+    # Test phases: tests within a parallel phase have no ordering dependency,
+    # so their network round trips overlap; phases still run in order
+    phases = [
+        (False, [("Initialize Sample Data", tester.test_init_data)]),
+        (True, [
+            ("Get Categories", tester.test_get_categories),
+            ("Get Products", tester.test_get_products),
+            ("Get Featured Products", tester.test_get_featured_products),
+            ("Invalid Endpoints", tester.test_invalid_endpoints)
+        ]),
+        (False, [
+            ("User Registration", tester.test_user_registration),
+            ("User Login", tester.test_user_login)
+        ]),
+        (True, [
+            ("Create Order", tester.test_create_order),
+            ("Get Orders", tester.test_get_orders),
+            ("Admin Functionality", tester.test_admin_functionality)
+        ])
     ]
     
-    failed_tests = []
-    
-    for test_name, test_func in tests:
+    def run(test):
+        test_name, test_func = test
         try:
-            if not test_func():
-                failed_tests.append(test_name)
+            return test_name, test_func()
         except Exception as e:
             print(f"❌ {test_name} - Exception: {str(e)}")
-            failed_tests.append(test_name)
+            return test_name, False
+    
+    failed_tests = []
+    
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        for parallel, group in phases:
+            results = pool.map(run, group) if parallel else map(run, group)
+            failed_tests.extend(name for name, passed in results if not passed)
     
     # Print final results
     print("\n" + "=" * 50)